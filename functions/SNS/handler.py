@@ -1,8 +1,8 @@
 import json
 import logging
-import boto3
 import os
 from wa_wrapper import WAWrapper
+from warmup import get_client, is_warmup_event, is_provisioned_init
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -24,8 +24,17 @@ def lambda_handler(event, context):  # pylint: disable=unused-argument
     dict: Success response
     """
     
+    if is_warmup_event(event):
+        get_client('sqs')
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': 'Warm'
+            })
+        }
+    
     try:
-        sqs_client = boto3.client('sqs')
+        sqs_client = get_client('sqs')
         queue_url = os.environ.get('SQS_QUEUE_URL')
         
         if not queue_url:
@@ -83,4 +92,8 @@ def lambda_handler(event, context):  # pylint: disable=unused-argument
         
     except Exception as e:
         logger.error(f"Error processing SNS notification: {str(e)}")
-        raise e
\ No newline at end of file
+        raise e
+
+
+if is_provisioned_init():
+    get_client('sqs')
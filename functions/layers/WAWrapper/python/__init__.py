@@ -5,6 +5,7 @@ Simple wrapper for detecting and handling WhatsApp webhook message types and sen
 
 from .wa_wrapper import WAWrapper
 from .wa_response import WAResponse
+from .warmup import get_client, is_warmup_event
 
 __version__ = "1.0.0"
-__all__ = ["WAWrapper", "WAResponse"]
\ No newline at end of file
+__all__ = ["WAWrapper", "WAResponse", "get_client", "is_warmup_event"]
\ No newline at end of file
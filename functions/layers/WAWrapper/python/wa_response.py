@@ -1,60 +1,186 @@
 import urllib3
 import json
 import logging
+import re
+from bisect import bisect_right
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# WhatsApp Cloud API limit for a text message body
+MAX_TEXT_LENGTH = 4096
+
+# Shared across handler invocations so warm containers reuse open connections
+http = urllib3.PoolManager()
+
+
+def configure_pool(maxsize):
+    """
+    Replace the shared connection pool with one keeping maxsize connections per host
+
+    Callers sending from several threads should size the pool to their thread
+    count, otherwise connections beyond the first are discarded after each send.
+
+    Args:
+        maxsize (int): Connections kept open per host
+    """
+    global http
+    http.clear()
+    http = urllib3.PoolManager(maxsize=maxsize)
+
+# Single pass over the text records every candidate split point by strength
+_BOUNDARY_PATTERN = re.compile(
+    r'(?P<paragraph>[ \t]*\n[ \t]*\n\s*)|(?P<sentence>[.!?](?=\s))|(?P<space>\s+)'
+)
+
+
+def _find_boundaries(text):
+    """
+    Collect split points in text, grouped by boundary strength
+
+    Args:
+        text (str): Text to scan
+
+    Returns:
+        tuple: Sorted lists of (paragraph, sentence, space) split offsets
+    """
+    paragraphs, sentences, spaces = [], [], []
+    for match in _BOUNDARY_PATTERN.finditer(text):
+        if match.lastgroup == 'paragraph':
+            paragraphs.append(match.end())
+        elif match.lastgroup == 'sentence':
+            sentences.append(match.end())
+        else:
+            spaces.append(match.end())
+    return paragraphs, sentences, spaces
+
+
+def _best_split(boundaries, start, limit):
+    """
+    Pick the strongest split point in (start, limit]
+
+    Args:
+        boundaries (tuple): Boundary lists from _find_boundaries
+        start (int): Offset where the current part begins
+        limit (int): Furthest offset the current part may end at
+
+    Returns:
+        int: Offset to split at, or limit if no boundary fits
+    """
+    for offsets in boundaries:
+        index = bisect_right(offsets, limit)
+        if index and offsets[index - 1] > start:
+            return offsets[index - 1]
+    return limit
+
+
+def _take_full_parts(message_text, max_length):
+    """
+    Cut parts off the front of message_text while more than max_length remains
+
+    Args:
+        message_text (str): Text to cut
+        max_length (int): Maximum characters per part
+
+    Returns:
+        tuple: (stripped non-empty parts, offset where the uncut remainder starts)
+    """
+    parts = []
+    start = 0
+    if len(message_text) <= max_length:
+        return parts, start
+
+    boundaries = _find_boundaries(message_text)
+    while len(message_text) - start > max_length:
+        end = _best_split(boundaries, start, start + max_length)
+        part = message_text[start:end].strip()
+        if part:
+            parts.append(part)
+        start = end
+    return parts, start
+
+
+def split_message(message_text, max_length=MAX_TEXT_LENGTH):
+    """
+    Split a long message into parts that fit in a single WhatsApp text body
+
+    Parts are cut on paragraph boundaries where possible, then sentence
+    boundaries, then whitespace, and only mid-word as a last resort.
+
+    Args:
+        message_text (str): Text to split
+        max_length (int): Maximum characters per part (default: MAX_TEXT_LENGTH)
+
+    Returns:
+        list: Non-empty message parts in order
+    """
+    if len(message_text) <= max_length:
+        return [message_text] if message_text.strip() else []
+
+    parts, start = _take_full_parts(message_text, max_length)
+    remainder = message_text[start:].strip()
+    if remainder:
+        parts.append(remainder)
+    return parts
+
+
+def warm_connection_pool(url="https://graph.facebook.com/"):
+    """
+    Open a keep-alive connection to the Graph API in the shared pool
+
+    Lets the first real send after a cold start skip the TCP/TLS handshake.
+
+    Args:
+        url (str): URL on the Graph API host to connect to
+
+    Returns:
+        bool: True if a connection was established
+    """
+    try:
+        response = http.request('HEAD', url, timeout=5, retries=False, preload_content=False)
+        response.release_conn()
+        return True
+    except Exception as e:
+        logger.warning(f"Could not pre-open Graph API connection: {str(e)}")
+        return False
+
 
 class WAResponse:
     """WhatsApp Business API response handler for sending messages"""
-    
-    def __init__(self, access_token, phone_number_id, api_version="v19.0"):
+
+    def __init__(self, access_token, phone_number_id, api_version="v19.0", max_text_length=MAX_TEXT_LENGTH):
         """
         Initialize WhatsApp response handler
-        
+
         Args:
             access_token (str): WhatsApp Business API access token
             phone_number_id (str): WhatsApp Business phone number ID
             api_version (str): Graph API version (default: v19.0)
+            max_text_length (int): Maximum characters per text message (default: 4096)
         """
         self.access_token = access_token
         self.phone_number_id = phone_number_id
         self.api_version = api_version
+        self.max_text_length = max_text_length
         self.base_url = f"https://graph.facebook.com/{api_version}/{phone_number_id}/messages"
-        
+
         self.headers = {
             'Content-Type': 'application/json',
             'Authorization': f'Bearer {access_token}'
         }
-    
-    def send_text_message(self, to_phone_number, message_text, preview_url=False):
+
+    def _post_message(self, payload, description):
         """
-        Send a text message to a WhatsApp user
-        
+        Post a message payload to the Graph API over the shared connection pool
+
         Args:
-            to_phone_number (str): Recipient's WhatsApp phone number
-            message_text (str): Text message to send
-            preview_url (bool): Enable link preview (default: False)
-            
+            payload (dict): Message payload
+            description (str): Message kind used in log lines (e.g. 'reply message')
+
         Returns:
             dict: API response or error information
         """
-        payload = {
-            "messaging_product": "whatsapp",
-            "recipient_type": "individual",
-            "to": to_phone_number,
-            "type": "text",
-            "text": {
-                "preview_url": preview_url,
-                "body": message_text
-            }
-        }
-        
         try:
-            logger.info(f"Sending text message to {to_phone_number}")
-            
-            http = urllib3.PoolManager()
             response = http.request(
                 'POST',
                 self.base_url,
@@ -62,102 +188,190 @@ class WAResponse:
                 body=json.dumps(payload),
                 timeout=30
             )
-            
+
             response_data = json.loads(response.data.decode('utf-8'))
-            
+
             if response.status == 200:
-                logger.info(f"Message sent successfully: {response_data}")
+                logger.info(f"{description.capitalize()} sent successfully: {response_data}")
                 return {
                     'success': True,
                     'message_id': response_data.get('messages', [{}])[0].get('id'),
                     'response': response_data
                 }
             else:
-                logger.error(f"Failed to send message: {response.status} - {response_data}")
+                logger.error(f"Failed to send {description}: {response.status} - {response_data}")
                 return {
                     'success': False,
                     'error': response_data,
                     'status_code': response.status
                 }
-                
+
         except urllib3.exceptions.HTTPError as e:
-            logger.error(f"Request error sending message: {str(e)}")
+            logger.error(f"Request error sending {description}: {str(e)}")
             return {
                 'success': False,
                 'error': f"Request failed: {str(e)}"
             }
         except Exception as e:
-            logger.error(f"Unexpected error sending message: {str(e)}")
+            logger.error(f"Unexpected error sending {description}: {str(e)}")
             return {
                 'success': False,
                 'error': f"Unexpected error: {str(e)}"
             }
-    
-    def send_reply_message(self, to_phone_number, message_text, reply_to_message_id, preview_url=False):
-        """
-        Send a text message as a reply to another message
-        
-        Args:
-            to_phone_number (str): Recipient's WhatsApp phone number
-            message_text (str): Text message to send
-            reply_to_message_id (str): ID of message being replied to
-            preview_url (bool): Enable link preview (default: False)
-            
-        Returns:
-            dict: API response or error information
-        """
+
+    def _text_payload(self, to_phone_number, message_text, preview_url, reply_to_message_id=None):
+        """Build a text message payload, threaded to reply_to_message_id if given"""
         payload = {
             "messaging_product": "whatsapp",
             "recipient_type": "individual",
             "to": to_phone_number,
             "type": "text",
-            "context": {
-                "message_id": reply_to_message_id
-            },
             "text": {
                 "preview_url": preview_url,
                 "body": message_text
             }
         }
-        
-        try:
-            logger.info(f"Sending reply message to {to_phone_number} in response to {reply_to_message_id}")
-            
-            http = urllib3.PoolManager()
-            response = http.request(
-                'POST',
-                self.base_url,
-                headers=self.headers,
-                body=json.dumps(payload),
-                timeout=30
-            )
-            
-            response_data = json.loads(response.data.decode('utf-8'))
-            
-            if response.status == 200:
-                logger.info(f"Reply message sent successfully: {response_data}")
-                return {
-                    'success': True,
-                    'message_id': response_data.get('messages', [{}])[0].get('id'),
-                    'response': response_data
-                }
-            else:
-                logger.error(f"Failed to send reply message: {response.status} - {response_data}")
-                return {
-                    'success': False,
-                    'error': response_data,
-                    'status_code': response.status
-                }
-                
-        except urllib3.exceptions.HTTPError as e:
-            logger.error(f"Request error sending reply message: {str(e)}")
-            return {
-                'success': False,
-                'error': f"Request failed: {str(e)}"
+        if reply_to_message_id:
+            payload["context"] = {
+                "message_id": reply_to_message_id
             }
-        except Exception as e:
-            logger.error(f"Unexpected error sending reply message: {str(e)}")
-            return {
-                'success': False,
-                'error': f"Unexpected error: {str(e)}"
-            }
\ No newline at end of file
+        return payload
+
+    def _send_parts(self, to_phone_number, parts, preview_url, reply_to_message_id, description):
+        """
+        Send message parts in order, threading only the first to reply_to_message_id
+
+        Stops at the first failed part so the recipient never sees parts out of order.
+
+        Returns:
+            dict: Result of the last attempted part, with 'message_ids' of all sent parts
+                  and 'parts_sent' / 'parts_total' counts
+        """
+        message_ids = []
+        result = {'success': False, 'error': 'Empty message'}
+
+        for index, part in enumerate(parts):
+            context_id = reply_to_message_id if index == 0 else None
+            if len(parts) > 1:
+                logger.info(f"Sending {description} part {index + 1}/{len(parts)} to {to_phone_number}")
+            result = self._post_message(
+                self._text_payload(to_phone_number, part, preview_url, context_id),
+                description
+            )
+            if not result.get('success'):
+                break
+            message_ids.append(result.get('message_id'))
+
+        result['message_ids'] = message_ids
+        result['parts_sent'] = len(message_ids)
+        result['parts_total'] = len(parts)
+        if message_ids:
+            result['message_id'] = message_ids[0]
+        return result
+
+    def send_text_message(self, to_phone_number, message_text, preview_url=False):
+        """
+        Send a text message to a WhatsApp user
+
+        Messages longer than max_text_length are split and sent as several parts.
+
+        Args:
+            to_phone_number (str): Recipient's WhatsApp phone number
+            message_text (str): Text message to send
+            preview_url (bool): Enable link preview (default: False)
+
+        Returns:
+            dict: API response or error information
+        """
+        logger.info(f"Sending text message to {to_phone_number}")
+        parts = split_message(message_text, self.max_text_length)
+        return self._send_parts(to_phone_number, parts, preview_url, None, 'message')
+
+    def send_reply_message(self, to_phone_number, message_text, reply_to_message_id, preview_url=False):
+        """
+        Send a text message as a reply to another message
+
+        Messages longer than max_text_length are split and sent as several parts;
+        only the first part is threaded to the original message.
+
+        Args:
+            to_phone_number (str): Recipient's WhatsApp phone number
+            message_text (str): Text message to send
+            reply_to_message_id (str): ID of message being replied to
+            preview_url (bool): Enable link preview (default: False)
+
+        Returns:
+            dict: API response or error information
+        """
+        logger.info(f"Sending reply message to {to_phone_number} in response to {reply_to_message_id}")
+        parts = split_message(message_text, self.max_text_length)
+        return self._send_parts(to_phone_number, parts, preview_url, reply_to_message_id, 'reply message')
+
+    def send_reply_stream(self, to_phone_number, chunks, reply_to_message_id, preview_url=False):
+        """
+        Send incrementally produced text as a reply, without waiting for the full output
+
+        Chunks are buffered and every completed paragraph is sent as soon as it
+        arrives; the remainder is sent once the chunks are exhausted. Only the
+        first message sent is threaded to the original message.
+
+        Args:
+            to_phone_number (str): Recipient's WhatsApp phone number
+            chunks (iterable): Text chunks in output order; non-string items are converted with str()
+            reply_to_message_id (str): ID of message being replied to
+            preview_url (bool): Enable link preview (default: False)
+
+        Returns:
+            dict: API response or error information
+        """
+        logger.info(f"Streaming reply message to {to_phone_number} in response to {reply_to_message_id}")
+        message_ids = []
+        parts_total = 0
+        buffer = ''
+        result = {'success': False, 'error': 'Empty message'}
+
+        def flush(parts):
+            nonlocal result, parts_total
+            if not parts:
+                return True
+            context_id = None if message_ids else reply_to_message_id
+            result = self._send_parts(to_phone_number, parts, preview_url, context_id, 'reply message')
+            parts_total += len(parts)
+            message_ids.extend(result['message_ids'])
+            return result.get('success')
+
+        for chunk in chunks:
+            if chunk is None:
+                continue
+            chunk = str(chunk)
+            if not chunk:
+                continue
+            # A new paragraph end can only start in the buffer's trailing whitespace or the new chunk
+            scan_from = len(buffer.rstrip())
+            buffer += chunk
+            paragraph_end = None
+            for match in _BOUNDARY_PATTERN.finditer(buffer, scan_from):
+                if match.lastgroup == 'paragraph':
+                    paragraph_end = match.end()
+
+            ready = []
+            if paragraph_end is not None:
+                ready = split_message(buffer[:paragraph_end].strip(), self.max_text_length)
+                buffer = buffer[paragraph_end:]
+            if len(buffer) > self.max_text_length:
+                # Too long to hold: send every full part now, keeping the raw tail so the next chunk joins it intact
+                full_parts, consumed = _take_full_parts(buffer, self.max_text_length)
+                ready.extend(full_parts)
+                buffer = buffer[consumed:]
+
+            if not flush(ready):
+                break
+        else:
+            flush(split_message(buffer.strip(), self.max_text_length))
+
+        result['message_ids'] = message_ids
+        result['parts_sent'] = len(message_ids)
+        result['parts_total'] = parts_total
+        if message_ids:
+            result['message_id'] = message_ids[0]
+        return result
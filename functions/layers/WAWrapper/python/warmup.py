@@ -0,0 +1,49 @@
+import os
+import boto3
+
+# Clients are kept for the life of the container so warm invocations skip setup
+_clients = {}
+
+
+def get_client(service_name, config=None):
+    """
+    Return a boto3 client for service_name, created once per container
+
+    Args:
+        service_name (str): AWS service name (e.g. 'sns')
+        config (botocore.config.Config): Client configuration; pass the same
+            instance on every call to get the same client back
+
+    Returns:
+        botocore.client.BaseClient: Cached client
+    """
+    key = (service_name, config)
+    if key not in _clients:
+        _clients[key] = boto3.client(service_name, config=config)
+    return _clients[key]
+
+
+def is_warmup_event(event):
+    """
+    Check if event is the synthetic warmup event sent by the scheduled warmer
+
+    Args:
+        event (dict): Lambda event
+
+    Returns:
+        bool: True for {"warmup": true}
+    """
+    return isinstance(event, dict) and event.get('warmup') is True
+
+
+def is_provisioned_init():
+    """
+    Check if the container is initializing for provisioned concurrency
+
+    Provisioned concurrency runs init ahead of traffic, so handlers can do
+    their warmup at import time instead of on the first request.
+
+    Returns:
+        bool: True during a provisioned-concurrency init
+    """
+    return os.environ.get('AWS_LAMBDA_INITIALIZATION_TYPE') == 'provisioned-concurrency'
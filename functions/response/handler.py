@@ -1,29 +1,63 @@
 import json
 import logging
 import os
-import boto3
+import time
+from botocore.config import Config
 from wa_wrapper import WAWrapper
-from wa_response import WAResponse
+from wa_response import WAResponse, warm_connection_pool
+from warmup import get_client, is_warmup_event, is_provisioned_init
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Seconds a fetched WA token is reused before Secrets Manager is asked again
+WA_TOKEN_TTL = int(os.environ.get('WA_TOKEN_TTL', '900'))
 
-def get_wa_token():
-    """Retrieve WhatsApp token from AWS Secrets Manager"""
+# Warmups refresh the token when it has less than this left, a little over the default warmup interval
+WA_TOKEN_REFRESH_MARGIN = int(os.environ.get('WA_TOKEN_REFRESH_MARGIN', '360'))
+
+# n8n can take up to 3 minutes to start in a cold container; a retried invoke would only start it again
+N8N_CLIENT_CONFIG = Config(read_timeout=240, retries={'total_max_attempts': 1})
+
+_wa_token_cache = {'value': None, 'expires': 0}
+_n8n_ready = False
+
+
+def get_wa_token(min_ttl=0):
+    """Retrieve WhatsApp token from AWS Secrets Manager, cached for WA_TOKEN_TTL seconds
+    
+    Parameters
+    ----------
+    min_ttl: int, optional
+        Fetch a fresh token if the cached one expires within this many seconds
+    
+    Returns
+    -------
+    str: WhatsApp token or None if it could not be retrieved
+    """
+    if _wa_token_cache['value'] and time.monotonic() + min_ttl < _wa_token_cache['expires']:
+        return _wa_token_cache['value']
     try:
-        secrets_client = boto3.client('secretsmanager')
+        secrets_client = get_client('secretsmanager')
         response = secrets_client.get_secret_value(SecretId='maya-wa-token')
-        return response['SecretString']
+        _wa_token_cache['value'] = response['SecretString']
+        _wa_token_cache['expires'] = time.monotonic() + WA_TOKEN_TTL
+        return _wa_token_cache['value']
     except Exception as e:
         logger.error(f"Failed to retrieve WA token: {str(e)}")
         return None
 
 
+def invalidate_wa_token():
+    """Drop the cached WA token so the next call fetches the current secret"""
+    _wa_token_cache['value'] = None
+    _wa_token_cache['expires'] = 0
+
+
 def invoke_n8n_lambda(prompt):
     """Invoke N8N Lambda container to process message"""
     try:
-        lambda_client = boto3.client('lambda')
+        lambda_client = get_client('lambda', config=N8N_CLIENT_CONFIG)
         
         payload = {
             'prompt': prompt
@@ -50,6 +84,158 @@ def invoke_n8n_lambda(prompt):
         return {'output': f"You said: {prompt}"}
 
 
+def wait_for_n8n():
+    """Send a warmup event to the N8N container so it starts n8n and waits until it is ready"""
+    try:
+        response = get_client('lambda', config=N8N_CLIENT_CONFIG).invoke(
+            FunctionName=os.environ.get('N8N_FUNCTION_NAME', 'N8NContainer'),
+            InvocationType='RequestResponse',
+            Payload=json.dumps({'warmup': True})
+        )
+        response_payload = json.loads(response['Payload'].read())
+        # The container answers 200 even when n8n failed to start; only the warmup branch reports 'ready'
+        body = json.loads(response_payload.get('body') or '{}')
+        if response['StatusCode'] == 200 and body.get('status') == 'ready':
+            return True
+        logger.error(f"N8N Lambda not ready: {response_payload}")
+        return False
+    except Exception as e:
+        logger.error(f"Failed to warm N8N Lambda: {str(e)}")
+        return False
+
+
+def warm():
+    """Pre-initialize clients and n8n once per container, and keep the WA token and Graph API connection fresh
+    
+    Returns
+    -------
+    dict: Readiness of the WA token, Graph API connection and n8n
+    """
+    global _n8n_ready
+    get_client('secretsmanager')
+    if not _n8n_ready:
+        _n8n_ready = wait_for_n8n()
+    
+    status = {
+        'wa_token': bool(get_wa_token(min_ttl=WA_TOKEN_REFRESH_MARGIN)),
+        'graph_api': warm_connection_pool(),
+        'n8n': _n8n_ready
+    }
+    logger.info(f"Warmup completed: {status}")
+    return status
+
+
+def process_webhook_payload(webhook_payload, wa_token=None, require_processor=False):
+    """Analyze a WhatsApp webhook payload and send the reply to its sender
+    
+    Parameters
+    ----------
+    webhook_payload: dict, required
+        WhatsApp webhook payload as published by the webhook function
+    
+    wa_token: str, optional
+        WhatsApp token to use instead of fetching it from Secrets Manager
+    
+    require_processor: bool, optional
+        If True, do not fall back to an echo reply when N8N fails; return False instead
+    
+    Returns
+    -------
+    bool: False if a reply was due but could not be sent, True otherwise
+    """
+    
+    # Use WAWrapper to analyze the WhatsApp message
+    wrapper = WAWrapper(webhook_payload)
+    
+    if not wrapper.is_valid_webhook():
+        logger.warning("Invalid WhatsApp webhook payload received")
+        return True
+    
+    message_type = wrapper.get_message_type()
+    sender_info = wrapper.get_sender_info()
+    message_content = wrapper.get_message_content()
+    
+    logger.info(f"Message Type: {message_type}")
+    logger.info(f"Sender: {sender_info.get('name', 'Unknown')} ({sender_info.get('phone', 'Unknown')})")
+    
+    # Get WA token and setup response handler
+    wa_token = wa_token or get_wa_token()
+    if not wa_token:
+        logger.error("Cannot send response - WA token not available")
+        return False
+    
+    # Get phone number ID from webhook payload
+    phone_number_id = wrapper.get_phone_number_id()
+    if not phone_number_id:
+        logger.error("Could not extract phone number ID from webhook")
+        return False
+    wa_response = WAResponse(wa_token, phone_number_id)
+    
+    sender_phone = sender_info.get('phone')
+    original_message_id = message_content.get('id')
+    
+    if not sender_phone:
+        return True
+    
+    # Handle different message types
+    if message_type == 'text':
+        text_body = message_content.get('body', '')
+        logger.info(f"Text message: {text_body}")
+        
+        # Invoke N8N Lambda container to process the message
+        n8n_response = invoke_n8n_lambda(text_body)
+        # Only a successful N8N call carries 'data'; failures return a bare {'output': ...}
+        if require_processor and 'data' not in n8n_response:
+            logger.error(f"N8N processing failed, not replying to {sender_phone}")
+            return False
+        response_message = n8n_response.get('data', {}).get('response', f"You said: {text_body}")
+        
+        if isinstance(response_message, list):
+            # Processor returned its output as a list of chunks. The invoke is RequestResponse, so the
+            # list is already complete; streaming it only gives paragraph-aligned message parts
+            response_result = wa_response.send_reply_stream(
+                to_phone_number=sender_phone,
+                chunks=response_message,
+                reply_to_message_id=original_message_id
+            )
+        else:
+            # Long outputs are split into several messages by WAResponse
+            response_result = wa_response.send_reply_message(
+                to_phone_number=sender_phone,
+                message_text=str(response_message),
+                reply_to_message_id=original_message_id
+            )
+        
+        if response_result.get('success'):
+            logger.info(f"Successfully echoed message to {sender_phone} in {response_result.get('parts_sent', 1)} part(s)")
+        else:
+            logger.error(f"Failed to echo message: {response_result.get('error')}")
+        
+    else:
+        # For all other message types, send "not supported" message
+        unsupported_message = f"Message type '{message_type}' is currently not supported."
+        
+        response_result = wa_response.send_reply_message(
+            to_phone_number=sender_phone,
+            message_text=unsupported_message,
+            reply_to_message_id=original_message_id
+        )
+        
+        if response_result.get('success'):
+            logger.info(f"Successfully sent unsupported message response to {sender_phone}")
+        else:
+            logger.error(f"Failed to send unsupported message: {response_result.get('error')}")
+        
+        logger.info(f"Unsupported message type: {message_type}")
+    
+    if response_result.get('status_code') == 401:
+        # Token was rotated (see update_secrets.sh); fetch it again on the next message
+        logger.warning("WA token rejected, clearing cached token")
+        invalidate_wa_token()
+    
+    return bool(response_result.get('success'))
+
+
 def lambda_handler(event, context):  # pylint: disable=unused-argument
     """Response Lambda function that processes messages from SQS queue
     
@@ -66,6 +252,15 @@ def lambda_handler(event, context):  # pylint: disable=unused-argument
     dict: Success response
     """
     
+    if is_warmup_event(event):
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': 'Warm',
+                'initialized': warm()
+            })
+        }
+    
     try:
         # Process each SQS record
         for record in event.get('Records', []):
@@ -80,82 +275,18 @@ def lambda_handler(event, context):  # pylint: disable=unused-argument
                 try:
                     webhook_payload = json.loads(message_body)
                     logger.info(f"Processing webhook payload from SQS")
-                    
-                    # Use WAWrapper to analyze the WhatsApp message
-                    wrapper = WAWrapper(webhook_payload)
-                    
-                    if wrapper.is_valid_webhook():
-                        message_type = wrapper.get_message_type()
-                        sender_info = wrapper.get_sender_info()
-                        message_content = wrapper.get_message_content()
-                        
-                        logger.info(f"Message Type: {message_type}")
-                        logger.info(f"Sender: {sender_info.get('name', 'Unknown')} ({sender_info.get('phone', 'Unknown')})")
-                        
-                        # Get WA token and setup response handler
-                        wa_token = get_wa_token()
-                        if not wa_token:
-                            logger.error("Cannot send response - WA token not available")
-                            continue
-                        
-                        # Get phone number ID from webhook payload
-                        phone_number_id = wrapper.get_phone_number_id()
-                        if not phone_number_id:
-                            logger.error("Could not extract phone number ID from webhook")
-                            continue
-                        wa_response = WAResponse(wa_token, phone_number_id)
-                        
-                        sender_phone = sender_info.get('phone')
-                        original_message_id = message_content.get('id')
-                        
-                        # Handle different message types
-                        if message_type == 'text':
-                            text_body = message_content.get('body', '')
-                            logger.info(f"Text message: {text_body}")
-                            
-                            # Invoke N8N Lambda container to process the message
-                            n8n_response = invoke_n8n_lambda(text_body)
-                            response_message = n8n_response.get('data', {}).get('response', f"You said: {text_body}")
-                            
-                            if sender_phone:
-                                response_result = wa_response.send_reply_message(
-                                    to_phone_number=sender_phone,
-                                    message_text=response_message,
-                                    reply_to_message_id=original_message_id
-                                )
-                                
-                                if response_result.get('success'):
-                                    logger.info(f"Successfully echoed message to {sender_phone}")
-                                else:
-                                    logger.error(f"Failed to echo message: {response_result.get('error')}")
-                            
-                        else:
-                            # For all other message types, send "not supported" message
-                            unsupported_message = f"Message type '{message_type}' is currently not supported."
-                            
-                            if sender_phone:
-                                response_result = wa_response.send_reply_message(
-                                    to_phone_number=sender_phone,
-                                    message_text=unsupported_message,
-                                    reply_to_message_id=original_message_id
-                                )
-                                
-                                if response_result.get('success'):
-                                    logger.info(f"Successfully sent unsupported message response to {sender_phone}")
-                                else:
-                                    logger.error(f"Failed to send unsupported message: {response_result.get('error')}")
-                            
-                            logger.info(f"Unsupported message type: {message_type}")
-                            
-                    else:
-                        logger.warning("Invalid WhatsApp webhook payload received")
+                    processed = process_webhook_payload(webhook_payload)
                         
                 except json.JSONDecodeError:
                     logger.info(f"Message body (non-JSON): {message_body}")
+                    processed = True
                 
                 # Add your additional message processing logic here
                 
-                logger.info(f"Successfully processed message {message_id}")
+                if processed:
+                    logger.info(f"Successfully processed message {message_id}")
+                else:
+                    logger.error(f"Failed to process message {message_id}")
         
         return {
             'statusCode': 200,
@@ -174,4 +305,8 @@ def lambda_handler(event, context):  # pylint: disable=unused-argument
                 'error': str(e),
                 'processed_records': len(event.get('Records', []))
             })
-        }
\ No newline at end of file
+        }
+
+
+if is_provisioned_init():
+    warm()
@@ -0,0 +1,386 @@
+"""
+Replay captured WhatsApp webhooks through the response handler
+
+Re-drives webhook payloads that never got a reply (archived JSONL captures or
+messages left on an SQS queue standing in for a DLQ) through WAWrapper and
+the response handler logic. Messages from the same sender are replayed in
+order; different senders are replayed in parallel under a shared rate limit.
+
+Usage:
+    python replay.py captured.jsonl --checkpoint replay.ckpt
+    python replay.py --queue-url https://sqs.../messageQueue.fifo --checkpoint replay.ckpt
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Allow running from a checkout where the layer is not installed under /opt/python
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'layers', 'WAWrapper', 'python'))
+
+import boto3
+from wa_wrapper import WAWrapper
+import wa_response
+import handler
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing calls evenly at a maximum rate"""
+
+    def __init__(self, rate):
+        """
+        Args:
+            rate (float): Maximum calls per second, 0 for unlimited
+        """
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self.next_allowed = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """Block until the next call is allowed"""
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_allowed - now
+            self.next_allowed = max(now, self.next_allowed) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Checkpoint:
+    """Append-only record of replayed message keys, so interrupted runs can resume"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Checkpoint file path, or None to disable checkpointing
+        """
+        self.path = path
+        self.done = set()
+        self.lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.done = {line.strip() for line in f if line.strip()}
+
+    def __contains__(self, key):
+        return key in self.done
+
+    def mark(self, key):
+        """Record key as replayed"""
+        with self.lock:
+            self.done.add(key)
+            if self.path:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(key + '\n')
+
+
+def unwrap_payload(record):
+    """
+    Extract the webhook payload from a captured record
+
+    Accepts raw webhook payloads as well as SQS records/messages ('body' / 'Body')
+    and SNS notifications ('Message') wrapping them.
+
+    Args:
+        record (dict or str): Captured record
+
+    Returns:
+        dict: Webhook payload or None if it cannot be parsed
+    """
+    for _ in range(3):
+        if isinstance(record, str):
+            try:
+                record = json.loads(record)
+            except json.JSONDecodeError:
+                return None
+        if not isinstance(record, dict):
+            return None
+        if 'object' in record:
+            return record
+        for key in ('body', 'Body', 'Message'):
+            if key in record:
+                record = record[key]
+                break
+        else:
+            return None
+    return None
+
+
+def message_key(wrapper, payload):
+    """Stable replay key: the WhatsApp message ID, or a hash of the payload"""
+    content = wrapper.get_message_content() or {}
+    if content.get('id'):
+        return content['id']
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def read_jsonl(paths):
+    """Yield (source, payload) for every parseable line of the given JSONL files"""
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                payload = unwrap_payload(line)
+                if payload is None:
+                    logger.warning(f"Skipping unparseable record at {path}:{line_number}")
+                    continue
+                yield f"{path}:{line_number}", payload
+
+
+def receive_batch(sqs_client, queue_url, batch_size):
+    """
+    Receive up to batch_size messages from an SQS queue
+
+    Batches are kept small enough to be replayed and deleted well within the
+    queue's visibility timeout, so receipt handles are still valid on delete.
+    A FIFO queue hands out one in-flight message per group at a time, so rerun
+    with the same checkpoint until the queue is empty.
+
+    Returns:
+        list: (receipt_handle, payload) pairs, payload None if it cannot be parsed
+    """
+    batch = []
+    while len(batch) < batch_size:
+        response = sqs_client.receive_message(
+            QueueUrl=queue_url,
+            MaxNumberOfMessages=min(10, batch_size - len(batch)),
+            WaitTimeSeconds=1
+        )
+        messages = response.get('Messages', [])
+        if not messages:
+            break
+        for message in messages:
+            payload = unwrap_payload(message.get('Body'))
+            if payload is None:
+                logger.warning(f"Unparseable queue message {message.get('MessageId')}")
+            batch.append((message['ReceiptHandle'], payload))
+    return batch
+
+
+def group_by_sender(records, checkpoint, on_skip=None):
+    """
+    Group records by sender, preserving arrival order within each sender
+
+    Args:
+        records (iterable): (source, payload) pairs in arrival order
+        checkpoint (Checkpoint): Already replayed message keys
+        on_skip (callable): Called with the source of every invalid, duplicate or already replayed record
+
+    Returns:
+        tuple: (OrderedDict sender -> [(source, key, payload)], Counter of skip reasons)
+    """
+    groups = OrderedDict()
+    skipped = Counter()
+    seen = set()
+    for source, payload in records:
+        wrapper = WAWrapper(payload)
+        if not wrapper.is_valid_webhook():
+            skipped['invalid'] += 1
+            if on_skip:
+                on_skip(source)
+            continue
+        key = message_key(wrapper, payload)
+        if key in checkpoint or key in seen:
+            skipped['checkpointed' if key in checkpoint else 'duplicate'] += 1
+            if on_skip:
+                on_skip(source)
+            continue
+        seen.add(key)
+        sender = (wrapper.get_sender_info() or {}).get('phone') or 'unknown'
+        groups.setdefault(sender, []).append((source, key, payload))
+    return groups, skipped
+
+
+def replay_sender(sender, items, limiter, checkpoint, on_success):
+    """
+    Replay one sender's messages in order, stopping at the first failure
+
+    Later messages are not attempted after a failure so that a resumed run
+    still delivers this sender's replies in their original order. The WA token
+    is looked up per message through the handler's cache, so a token rotated
+    mid-run is picked up after the first 401.
+
+    Returns:
+        Counter: 'replayed' and 'failed' / 'pending' counts
+    """
+    stats = Counter()
+    for index, (source, key, payload) in enumerate(items):
+        limiter.wait()
+        try:
+            ok = handler.process_webhook_payload(payload, require_processor=True)
+        except Exception as e:
+            logger.error(f"Error replaying {source}: {str(e)}")
+            ok = False
+        if not ok:
+            logger.error(f"Replay failed for sender {sender} at {source}, holding {len(items) - index - 1} later message(s)")
+            stats['failed'] += 1
+            stats['pending'] += len(items) - index - 1
+            break
+        checkpoint.mark(key)
+        stats['replayed'] += 1
+        if on_success:
+            try:
+                on_success(source)
+            except Exception as e:
+                # Already checkpointed, so a rerun skips it and retries the cleanup
+                logger.error(f"Post-replay cleanup failed for {source}: {str(e)}")
+    return stats
+
+
+def replay_groups(executor, groups, limiter, checkpoint, on_success=None):
+    """
+    Replay grouped messages, one task per sender
+
+    Returns:
+        tuple: (Counter of replay stats, set of senders that hit a failure)
+    """
+    stats = Counter()
+    failed_senders = set()
+    futures = {
+        executor.submit(replay_sender, sender, items, limiter, checkpoint, on_success): sender
+        for sender, items in groups.items()
+    }
+    for future in as_completed(futures):
+        sender_stats = future.result()
+        if sender_stats['failed']:
+            failed_senders.add(futures[future])
+        stats.update(sender_stats)
+    return stats, failed_senders
+
+
+def replay_queue(executor, queue_url, batch_size, max_messages, limiter, checkpoint):
+    """
+    Drain an SQS queue in bounded batches, deleting each message once it is handled
+
+    Each batch is received, replayed and deleted before the next is received.
+    Messages of a sender that already failed are left on the queue untouched so
+    the sender's replies stay in order on a rerun. Invalid and already replayed
+    messages are deleted.
+
+    Returns:
+        Counter: Replay stats across all batches
+    """
+    sqs_client = boto3.client('sqs')
+    stats = Counter()
+    failed_senders = set()
+    received = 0
+
+    def delete(receipt_handle):
+        sqs_client.delete_message(QueueUrl=queue_url, ReceiptHandle=receipt_handle)
+
+    def discard(receipt_handle):
+        try:
+            delete(receipt_handle)
+        except Exception as e:
+            logger.error(f"Failed to delete skipped queue message: {str(e)}")
+
+    while not max_messages or received < max_messages:
+        size = min(batch_size, max_messages - received) if max_messages else batch_size
+        batch = receive_batch(sqs_client, queue_url, size)
+        if not batch:
+            break
+        received += len(batch)
+
+        for receipt_handle, payload in batch:
+            if payload is None:
+                stats['invalid'] += 1
+                discard(receipt_handle)
+        records = [(receipt_handle, payload) for receipt_handle, payload in batch if payload is not None]
+        groups, skipped = group_by_sender(records, checkpoint, on_skip=discard)
+        stats.update(skipped)
+
+        for sender in failed_senders & set(groups):
+            stats['pending'] += len(groups.pop(sender))
+
+        batch_stats, batch_failed = replay_groups(executor, groups, limiter, checkpoint, on_success=delete)
+        stats.update(batch_stats)
+        failed_senders |= batch_failed
+        logger.info(f"Batch done: {received} message(s) received so far, {dict(stats)}")
+    return stats
+
+
+def main(argv=None):
+    """Replay entry point
+
+    Parameters
+    ----------
+    argv: list, optional
+        Command line arguments, defaults to sys.argv
+
+    Returns
+    -------
+    int: Process exit code, 1 if any message failed to replay
+    """
+    parser = argparse.ArgumentParser(description='Replay captured WhatsApp webhooks through the response handler')
+    parser.add_argument('files', nargs='*', help='JSONL files with one webhook payload, SQS or SNS record per line')
+    parser.add_argument('--queue-url', help='Drain messages from this SQS queue instead of files')
+    parser.add_argument('--max-messages', type=int, default=0, help='Stop after this many queue messages (default: all)')
+    parser.add_argument('--batch-size', type=int, default=100,
+                        help='Queue messages received, replayed and deleted together (default: 100)')
+    parser.add_argument('--workers', type=int, default=8, help='Senders replayed in parallel (default: 8)')
+    parser.add_argument('--rate', type=float, default=20.0, help='Maximum messages per second, 0 for unlimited (default: 20)')
+    parser.add_argument('--checkpoint', help='File recording replayed message IDs; rerun with it to resume')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Parse and group file messages without sending anything (not supported with --queue-url)')
+    args = parser.parse_args(argv)
+
+    if bool(args.files) == bool(args.queue_url):
+        parser.error('provide JSONL files or --queue-url, but not both')
+    if args.dry_run and args.queue_url:
+        # Receiving would hide the messages from the live consumer and count as a delivery attempt
+        parser.error('--dry-run only reads JSONL files; it cannot inspect a queue without receiving from it')
+
+    logging.basicConfig(format='%(asctime)s %(levelname)s %(message)s')
+
+    checkpoint = Checkpoint(args.checkpoint)
+
+    if args.dry_run:
+        groups, stats = group_by_sender(read_jsonl(args.files), checkpoint)
+        total = sum(len(items) for items in groups.values())
+        for sender, items in groups.items():
+            types = Counter(WAWrapper(payload).get_message_type() for _, _, payload in items)
+            print(f"{sender}: {len(items)} message(s) {dict(types)}")
+        print(json.dumps({'would_replay': total, 'senders': len(groups), 'skipped': dict(stats)}))
+        return 0
+
+    # Fail fast; later lookups hit the handler's token cache
+    if not handler.get_wa_token():
+        logger.error("Cannot replay - WA token not available")
+        return 1
+
+    # One Graph API connection per worker, so parallel senders reuse their connections
+    wa_response.configure_pool(max(1, args.workers))
+    limiter = RateLimiter(args.rate)
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        if args.queue_url:
+            stats = replay_queue(executor, args.queue_url, max(1, args.batch_size), args.max_messages,
+                                 limiter, checkpoint)
+        else:
+            groups, stats = group_by_sender(read_jsonl(args.files), checkpoint)
+            total = sum(len(items) for items in groups.values())
+            logger.info(f"Loaded {total} message(s) from {len(groups)} sender(s), skipped {dict(stats)}")
+            replay_stats, _ = replay_groups(executor, groups, limiter, checkpoint)
+            stats.update(replay_stats)
+
+    elapsed = time.monotonic() - started
+    print(json.dumps({'replayed': stats['replayed'], 'failed': stats['failed'], 'pending': stats['pending'],
+                      'skipped': {k: stats[k] for k in ('invalid', 'checkpointed', 'duplicate') if stats[k]},
+                      'seconds': round(elapsed, 1)}))
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,6 @@
 import json
-import boto3
 import os
+from warmup import get_client, is_warmup_event, is_provisioned_init
 
 
 def lambda_handler(event, context):  # pylint: disable=unused-argument
@@ -19,6 +19,15 @@ def lambda_handler(event, context):  # pylint: disable=unused-argument
     API Gateway Lambda Proxy Output Format: dict
     """
     
+    if is_warmup_event(event):
+        get_client('sns')
+        return {
+            "statusCode": 200,
+            "body": json.dumps({
+                "message": "Warm"
+            })
+        }
+    
     http_method = event.get('httpMethod') or event.get('requestContext', {}).get('http', {}).get('method')
     
     # Handle GET request with hub.challenge for webhook verification
@@ -41,7 +50,7 @@ def lambda_handler(event, context):  # pylint: disable=unused-argument
                 webhook_payload = json.loads(webhook_payload)
             
             # Publish entire payload to SNS topic
-            sns_client = boto3.client('sns')
+            sns_client = get_client('sns')
             topic_arn = os.environ.get('SNS_TOPIC_ARN')
             
             if topic_arn:
@@ -79,4 +88,8 @@ def lambda_handler(event, context):  # pylint: disable=unused-argument
         "body": json.dumps({
             "message": "OK"
         })
-    }
\ No newline at end of file
+    }
+
+
+if is_provisioned_init():
+    get_client('sns')
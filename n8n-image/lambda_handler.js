@@ -90,6 +90,15 @@ exports.handler = async (event) => {
         await waitForN8n();
         console.log('n8n health check completed successfully, proceeding with webhook call...');
 
+        // Warmup events only bring n8n up; the workflow is not triggered
+        if (event && event.warmup === true) {
+            console.log('Warmup event received, n8n is ready');
+            return {
+                statusCode: 200,
+                body: JSON.stringify({ status: 'ready', timestamp: new Date().toISOString() })
+            };
+        }
+
         const postData = JSON.stringify(event);
         const options = {
             hostname: '127.0.0.1',
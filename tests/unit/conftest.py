@@ -0,0 +1,9 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# Mirror the Lambda runtime: layer code on the path next to the function code
+sys.path.insert(0, os.path.join(ROOT, 'functions', 'layers', 'WAWrapper', 'python'))
+sys.path.insert(0, os.path.join(ROOT, 'functions', 'response'))
+sys.path.insert(0, os.path.join(ROOT, 'functions'))
@@ -0,0 +1,17 @@
+"""Webhook payload builders shared by the unit tests"""
+
+
+def webhook(message_id, sender, body='hi'):
+    """Build a text message webhook as delivered by WhatsApp"""
+    return {
+        'object': 'whatsapp_business_account',
+        'entry': [{
+            'changes': [{
+                'value': {
+                    'metadata': {'phone_number_id': '123'},
+                    'contacts': [{'profile': {'name': 'Test'}, 'wa_id': sender}],
+                    'messages': [{'from': sender, 'id': message_id, 'type': 'text', 'text': {'body': body}}]
+                }
+            }]
+        }]
+    }
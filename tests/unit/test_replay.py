@@ -0,0 +1,180 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import handler
+import replay
+from payloads import webhook
+
+
+def message_id_of(payload):
+    return payload['entry'][0]['changes'][0]['value']['messages'][0]['id']
+
+
+class FakeSQS:
+    """In-memory queue handing out at most one batch of visible messages per receive"""
+
+    def __init__(self, payloads):
+        self.messages = {f"rh-{index}": json.dumps(payload) for index, payload in enumerate(payloads)}
+        self.in_flight = set()
+        self.deleted = []
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages, WaitTimeSeconds):
+        visible = [handle for handle in self.messages if handle not in self.in_flight][:MaxNumberOfMessages]
+        self.in_flight.update(visible)
+        return {'Messages': [{'ReceiptHandle': handle, 'MessageId': handle, 'Body': self.messages[handle]}
+                             for handle in visible]}
+
+    def delete_message(self, QueueUrl, ReceiptHandle):
+        del self.messages[ReceiptHandle]
+        self.deleted.append(ReceiptHandle)
+
+
+class Replayed(list):
+    """Message IDs passed to process_webhook_payload, in call order"""
+
+    def __init__(self):
+        super().__init__()
+        self.failing = set()
+
+
+@pytest.fixture
+def replayed(monkeypatch):
+    """Record replayed message IDs; IDs added to replayed.failing fail"""
+    calls = Replayed()
+
+    def process(payload, wa_token=None, require_processor=False):
+        assert wa_token is None
+        assert require_processor
+        calls.append(message_id_of(payload))
+        return message_id_of(payload) not in calls.failing
+
+    monkeypatch.setattr(handler, 'process_webhook_payload', process)
+    return calls
+
+
+def test_unwrap_payload_accepts_raw_sqs_and_sns_records():
+    payload = webhook('w1', 's1')
+    assert replay.unwrap_payload(payload) == payload
+    assert replay.unwrap_payload(json.dumps(payload)) == payload
+    assert replay.unwrap_payload({'body': json.dumps(payload)}) == payload
+    assert replay.unwrap_payload({'Body': json.dumps({'Message': json.dumps(payload)})}) == payload
+    assert replay.unwrap_payload('not json') is None
+    assert replay.unwrap_payload({'other': 1}) is None
+
+
+def test_checkpoint_persists_marked_keys(tmp_path):
+    path = str(tmp_path / 'replay.ckpt')
+    checkpoint = replay.Checkpoint(path)
+    checkpoint.mark('w1')
+    checkpoint.mark('w2')
+    resumed = replay.Checkpoint(path)
+    assert 'w1' in resumed and 'w2' in resumed and 'w3' not in resumed
+
+
+def test_group_by_sender_keeps_order_and_skips(tmp_path):
+    checkpoint = replay.Checkpoint(None)
+    checkpoint.mark('w2')
+    records = [(str(index), payload) for index, payload in enumerate([
+        webhook('w1', 's1'), webhook('w2', 's1'), webhook('w3', 's2'),
+        webhook('w4', 's1'), webhook('w1', 's1'), {'object': 'other'}
+    ])]
+    skipped_sources = []
+    groups, skipped = replay.group_by_sender(records, checkpoint, on_skip=skipped_sources.append)
+    assert list(groups) == ['s1', 's2']
+    assert [key for _, key, _ in groups['s1']] == ['w1', 'w4']
+    assert skipped == {'checkpointed': 1, 'duplicate': 1, 'invalid': 1}
+    assert skipped_sources == ['1', '4', '5']
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = replay.RateLimiter(50)
+    started = time.monotonic()
+    for _ in range(6):
+        limiter.wait()
+    assert time.monotonic() - started >= 0.09
+
+
+def test_rate_limiter_zero_is_unlimited():
+    limiter = replay.RateLimiter(0)
+    started = time.monotonic()
+    for _ in range(1000):
+        limiter.wait()
+    assert time.monotonic() - started < 0.5
+
+
+def test_replay_sender_stops_at_first_failure(replayed):
+    replayed.failing.add('w2')
+    checkpoint = replay.Checkpoint(None)
+    items = [(key, key, webhook(key, 's1')) for key in ('w1', 'w2', 'w3')]
+    stats = replay.replay_sender('s1', items, replay.RateLimiter(0), checkpoint, None)
+    assert replayed == ['w1', 'w2']
+    assert stats == {'replayed': 1, 'failed': 1, 'pending': 1}
+    assert 'w1' in checkpoint and 'w2' not in checkpoint
+
+
+def test_replay_sender_survives_cleanup_errors(replayed):
+    def on_success(source):
+        raise RuntimeError('receipt handle expired')
+
+    items = [(key, key, webhook(key, 's1')) for key in ('w1', 'w2')]
+    stats = replay.replay_sender('s1', items, replay.RateLimiter(0), replay.Checkpoint(None), on_success)
+    assert stats == {'replayed': 2}
+
+
+def test_replay_queue_processes_bounded_batches(replayed, monkeypatch):
+    replayed.failing.add('w2')
+    checkpoint = replay.Checkpoint(None)
+    checkpoint.mark('w0')
+    sqs = FakeSQS([webhook('w0', 's1'), webhook('w1', 's1'), webhook('w2', 's2'),
+                   webhook('w3', 's3'), webhook('w4', 's2'), webhook('w5', 's3')])
+    monkeypatch.setattr(replay.boto3, 'client', lambda service_name: sqs)
+
+    receive = sqs.receive_message
+    batches = []
+
+    def receive_tracking(**kwargs):
+        # Every earlier batch must be replayed and deleted before the next receive
+        assert not (sqs.in_flight & set(sqs.messages)) - held
+        response = receive(**kwargs)
+        if response['Messages']:
+            batches.append([message['ReceiptHandle'] for message in response['Messages']])
+        return response
+
+    held = {'rh-2', 'rh-4'}
+    sqs.receive_message = receive_tracking
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        stats = replay.replay_queue(executor, 'queue', 3, 0, replay.RateLimiter(0), checkpoint)
+
+    assert batches == [['rh-0', 'rh-1', 'rh-2'], ['rh-3', 'rh-4', 'rh-5']]
+    assert sorted(replayed) == ['w1', 'w2', 'w3', 'w5']
+    assert stats['replayed'] == 3 and stats['failed'] == 1 and stats['pending'] == 1
+    assert stats['checkpointed'] == 1
+    # Checkpointed and replayed messages are deleted; the failed sender's messages stay queued
+    assert sorted(sqs.deleted) == ['rh-0', 'rh-1', 'rh-3', 'rh-5']
+
+
+def test_dry_run_refuses_queue():
+    with pytest.raises(SystemExit):
+        replay.main(['--queue-url', 'queue', '--dry-run'])
+
+
+def test_main_replays_files_and_resumes(replayed, monkeypatch, tmp_path, capsys):
+    monkeypatch.setattr(handler, 'get_wa_token', lambda: 'token')
+    pool_sizes = []
+    monkeypatch.setattr(replay.wa_response, 'configure_pool', pool_sizes.append)
+    source = tmp_path / 'captured.jsonl'
+    source.write_text('\n'.join(json.dumps(webhook(f"w{index}", f"s{index % 2}")) for index in range(4)))
+    checkpoint = str(tmp_path / 'replay.ckpt')
+
+    replayed.failing.add('w2')
+    assert replay.main([str(source), '--checkpoint', checkpoint, '--rate', '0', '--workers', '4']) == 1
+    assert pool_sizes == [4]
+    assert sorted(replayed) == ['w0', 'w1', 'w2', 'w3']
+
+    replayed.clear()
+    replayed.failing.clear()
+    assert replay.main([str(source), '--checkpoint', checkpoint, '--rate', '0']) == 0
+    assert replayed == ['w2']
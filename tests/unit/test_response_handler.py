@@ -0,0 +1,57 @@
+import json
+import logging
+
+import pytest
+
+import handler
+import wa_response
+from payloads import webhook
+
+
+class FakeResponse:
+    def __init__(self, status, data):
+        self.status = status
+        self.data = json.dumps(data).encode('utf-8')
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Capture message bodies posted to the Graph API"""
+    bodies = []
+
+    def request(method, url, headers=None, body=None, timeout=None):
+        bodies.append(json.loads(body)['text']['body'])
+        return FakeResponse(200, {'messages': [{'id': 'wamid.1'}]})
+
+    monkeypatch.setattr(wa_response.http, 'request', request)
+    return bodies
+
+
+@pytest.fixture
+def n8n_down(monkeypatch):
+    monkeypatch.setattr(handler, 'invoke_n8n_lambda', lambda prompt: {'output': f"You said: {prompt}"})
+
+
+def test_processor_failure_falls_back_to_echo(sent, n8n_down):
+    assert handler.process_webhook_payload(webhook('w1', 's1', 'hello'), wa_token='token')
+    assert sent == ['You said: hello']
+
+
+def test_processor_failure_is_reported_when_required(sent, n8n_down):
+    assert not handler.process_webhook_payload(webhook('w1', 's1', 'hello'), wa_token='token', require_processor=True)
+    assert sent == []
+
+
+def test_processor_reply_is_sent(sent, monkeypatch):
+    monkeypatch.setattr(handler, 'invoke_n8n_lambda', lambda prompt: {'data': {'response': 'Answer'}})
+    assert handler.process_webhook_payload(webhook('w1', 's1', 'hello'), wa_token='token', require_processor=True)
+    assert sent == ['Answer']
+
+
+def test_lambda_handler_logs_failed_messages(monkeypatch, caplog):
+    monkeypatch.setattr(handler, 'get_wa_token', lambda: None)
+    event = {'Records': [{'eventSource': 'aws:sqs', 'messageId': 'sqs-1', 'body': json.dumps(webhook('w1', 's1'))}]}
+    with caplog.at_level(logging.INFO):
+        handler.lambda_handler(event, None)
+    assert 'Failed to process message sqs-1' in caplog.text
+    assert 'Successfully processed message sqs-1' not in caplog.text
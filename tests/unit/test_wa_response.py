@@ -0,0 +1,141 @@
+import json
+
+import pytest
+
+import wa_response
+from wa_response import WAResponse, split_message
+
+
+class FakeResponse:
+    def __init__(self, status, data):
+        self.status = status
+        self.data = json.dumps(data).encode('utf-8')
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Capture payloads posted to the Graph API, answering each with a new message ID"""
+    payloads = []
+
+    def request(method, url, headers=None, body=None, timeout=None):
+        payloads.append(json.loads(body))
+        return FakeResponse(200, {'messages': [{'id': f"wamid.{len(payloads)}"}]})
+
+    monkeypatch.setattr(wa_response.http, 'request', request)
+    return payloads
+
+
+def bodies(payloads):
+    return [payload['text']['body'] for payload in payloads]
+
+
+def test_split_message_short_text_is_untouched():
+    assert split_message('hello there', 20) == ['hello there']
+
+
+def test_split_message_whitespace_only_is_empty():
+    assert split_message('   ', 20) == []
+    assert split_message(' ' * 30, 20) == []
+
+
+def test_split_message_prefers_paragraph_then_sentence_then_space():
+    text = 'One. Two three.\n\nFour five six seven.'
+    assert split_message(text, 20) == ['One. Two three.', 'Four five six seven.']
+    assert split_message('First bit. Second bit here', 20) == ['First bit.', 'Second bit here']
+    assert split_message('aaaa bbbb cccc dddd eeee', 12) == ['aaaa bbbb', 'cccc dddd', 'eeee']
+
+
+def test_split_message_cuts_mid_word_as_last_resort():
+    assert split_message('x' * 25, 10) == ['x' * 10, 'x' * 10, 'x' * 5]
+
+
+def test_split_message_parts_fit_and_keep_all_words():
+    text = ('Sentence one is here. ' * 30 + '\n\n') * 5
+    parts = split_message(text, 1000)
+    assert all(len(part) <= 1000 for part in parts)
+    assert ' '.join(parts).split() == text.split()
+
+
+def test_best_split_picks_strongest_boundary_in_window():
+    boundaries = ([10], [5, 15], [3, 8, 18])
+    assert wa_response._best_split(boundaries, 0, 12) == 10
+    assert wa_response._best_split(boundaries, 10, 17) == 15
+    assert wa_response._best_split(([], [], [3]), 3, 9) == 9
+
+
+def test_send_reply_message_threads_only_first_part(sent):
+    result = WAResponse('token', '123', max_text_length=12).send_reply_message(
+        '555', 'aaaa bbbb cccc dddd eeee', 'wamid.orig'
+    )
+    assert result['success']
+    assert result['message_ids'] == ['wamid.1', 'wamid.2', 'wamid.3']
+    assert bodies(sent) == ['aaaa bbbb', 'cccc dddd', 'eeee']
+    assert sent[0]['context'] == {'message_id': 'wamid.orig'}
+    assert all('context' not in payload for payload in sent[1:])
+
+
+def test_send_reply_message_stops_at_first_failed_part(monkeypatch):
+    statuses = iter([200, 500, 200])
+
+    def request(method, url, headers=None, body=None, timeout=None):
+        return FakeResponse(next(statuses), {'messages': [{'id': 'wamid.1'}]})
+
+    monkeypatch.setattr(wa_response.http, 'request', request)
+    result = WAResponse('token', '123', max_text_length=12).send_reply_message(
+        '555', 'aaaa bbbb cccc dddd eeee', 'wamid.orig'
+    )
+    assert not result['success']
+    assert result['parts_sent'] == 1
+    assert result['parts_total'] == 3
+
+
+def test_send_reply_stream_sends_paragraphs_as_they_complete(sent):
+    def chunks():
+        yield 'First para'
+        yield 'graph.\n\nSecond '
+        assert bodies(sent) == ['First paragraph.']
+        yield 'one.'
+
+    result = WAResponse('token', '123').send_reply_stream('555', chunks(), 'wamid.orig')
+    assert result['success']
+    assert bodies(sent) == ['First paragraph.', 'Second one.']
+    assert sent[0]['context'] == {'message_id': 'wamid.orig'}
+    assert 'context' not in sent[1]
+
+
+def test_send_reply_stream_keeps_whitespace_between_chunks(sent):
+    WAResponse('token', '123', max_text_length=20).send_reply_stream(
+        '555', ['aaaa bbbb cccc dddd eeee ', 'ffff'], 'wamid.orig'
+    )
+    assert bodies(sent) == ['aaaa bbbb cccc dddd', 'eeee ffff']
+
+
+def test_send_reply_stream_ignores_whitespace_only_overflow(sent):
+    result = WAResponse('token', '123', max_text_length=20).send_reply_stream(
+        '555', [' ' * 30, 'hello'], 'wamid.orig'
+    )
+    assert result['success']
+    assert bodies(sent) == ['hello']
+
+
+def test_send_reply_stream_finds_paragraph_split_across_chunks(sent):
+    def chunks():
+        yield 'para one.\n  '
+        yield ' \nxyz'
+        assert bodies(sent) == ['para one.']
+        yield 'more'
+
+    WAResponse('token', '123').send_reply_stream('555', chunks(), 'wamid.orig')
+    assert bodies(sent) == ['para one.', 'xyzmore']
+
+
+def test_send_reply_stream_converts_non_string_chunks(sent):
+    result = WAResponse('token', '123').send_reply_stream('555', ['Total: ', 42, None, '.'], 'wamid.orig')
+    assert result['success']
+    assert bodies(sent) == ['Total: 42.']
+
+
+def test_configure_pool_sizes_per_host_connections(monkeypatch):
+    monkeypatch.setattr(wa_response, 'http', wa_response.http)
+    wa_response.configure_pool(8)
+    assert wa_response.http.connection_pool_kw['maxsize'] == 8
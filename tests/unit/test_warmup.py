@@ -0,0 +1,134 @@
+import io
+import json
+
+import pytest
+
+import handler
+import wa_response
+import warmup
+import webhook
+from payloads import webhook as webhook_payload
+
+
+def lambda_payload(body, status_code=200):
+    return io.BytesIO(json.dumps({'statusCode': status_code, 'body': json.dumps(body)}).encode('utf-8'))
+
+
+class FakeClient:
+    """boto3 client stand-in recording every API call"""
+
+    def __init__(self, service_name, calls, n8n):
+        self.service_name = service_name
+        self.calls = calls
+        self.n8n = n8n
+
+    def get_secret_value(self, **kwargs):
+        self.calls.append(('secretsmanager', 'get_secret_value'))
+        return {'SecretString': 'token'}
+
+    def invoke(self, **kwargs):
+        self.calls.append(('lambda', 'invoke'))
+        if json.loads(kwargs['Payload']) == {'warmup': True}:
+            return {'StatusCode': 200, 'Payload': lambda_payload(self.n8n['warmup'])}
+        return {'StatusCode': 200, 'Payload': lambda_payload({'data': {'response': 'Answer'}})}
+
+
+class FakePoolResponse:
+    def __init__(self, status=200, data=None):
+        self.status = status
+        self.data = json.dumps(data or {'messages': [{'id': 'wamid.1'}]}).encode('utf-8')
+
+    def release_conn(self):
+        pass
+
+
+@pytest.fixture
+def n8n():
+    """Warmup answer of the N8N container"""
+    return {'warmup': {'status': 'ready'}}
+
+
+@pytest.fixture
+def calls(monkeypatch, n8n):
+    """Record boto3 client creation, client API calls and HTTP pool requests"""
+    recorded = []
+
+    def client(service_name, config=None):
+        recorded.append(('boto3.client', service_name))
+        return FakeClient(service_name, recorded, n8n)
+
+    def request(method, url, **kwargs):
+        recorded.append(('http', method))
+        return FakePoolResponse()
+
+    monkeypatch.setattr(warmup.boto3, 'client', client)
+    monkeypatch.setattr(wa_response.http, 'request', request)
+    monkeypatch.setattr(warmup, '_clients', {})
+    monkeypatch.setattr(handler, '_n8n_ready', False)
+    monkeypatch.setattr(handler, '_wa_token_cache', {'value': None, 'expires': 0})
+    return recorded
+
+
+def test_message_after_warmup_skips_secrets_and_client_setup(calls):
+    first = handler.lambda_handler({'warmup': True}, None)
+    assert json.loads(first['body'])['initialized'] == {'wa_token': True, 'graph_api': True, 'n8n': True}
+    assert ('secretsmanager', 'get_secret_value') in calls
+    assert ('lambda', 'invoke') in calls
+
+    calls.clear()
+    assert handler.process_webhook_payload(webhook_payload('w1', 's1'))
+    assert calls == [('lambda', 'invoke'), ('http', 'POST')]
+
+
+def test_repeat_warmup_only_keeps_connection_open(calls):
+    handler.lambda_handler({'warmup': True}, None)
+    calls.clear()
+    handler.lambda_handler({'warmup': True}, None)
+    assert calls == [('http', 'HEAD')]
+
+
+def test_warmup_refreshes_token_near_expiry(calls, monkeypatch):
+    handler.lambda_handler({'warmup': True}, None)
+    handler._wa_token_cache['expires'] = handler.time.monotonic() + handler.WA_TOKEN_REFRESH_MARGIN - 1
+    calls.clear()
+    handler.lambda_handler({'warmup': True}, None)
+    assert ('secretsmanager', 'get_secret_value') in calls
+
+
+def test_warmup_retries_n8n_that_failed_to_start(calls, n8n):
+    n8n['warmup'] = {'success': False, 'error': 'n8n failed to start within 3 minutes'}
+    first = handler.lambda_handler({'warmup': True}, None)
+    assert json.loads(first['body'])['initialized']['n8n'] is False
+
+    n8n['warmup'] = {'status': 'ready'}
+    calls.clear()
+    second = handler.lambda_handler({'warmup': True}, None)
+    assert json.loads(second['body'])['initialized']['n8n'] is True
+    assert ('lambda', 'invoke') in calls
+
+
+def test_n8n_client_waits_out_cold_start_without_retrying():
+    config = handler.N8N_CLIENT_CONFIG
+    assert config.read_timeout > 180
+    assert config.retries == {'total_max_attempts': 1}
+
+
+def test_rejected_token_is_refetched(calls, monkeypatch):
+    handler.lambda_handler({'warmup': True}, None)
+    monkeypatch.setattr(wa_response.http, 'request',
+                        lambda method, url, **kwargs: FakePoolResponse(401, {'error': {'code': 190}}))
+    assert not handler.process_webhook_payload(webhook_payload('w1', 's1'))
+
+    calls.clear()
+    handler.get_wa_token()
+    assert calls == [('secretsmanager', 'get_secret_value')]
+
+
+def test_webhook_warmup_has_no_side_effects(calls):
+    response = webhook.lambda_handler({'warmup': True}, None)
+    assert response['statusCode'] == 200
+    assert calls == [('boto3.client', 'sns')]
+
+    calls.clear()
+    webhook.lambda_handler({'warmup': True}, None)
+    assert calls == []